@@ -1,32 +1,48 @@
 # streamlit_app.py
 # ------------------------------------------------------------
 # Quadratic Voting app
-# - Saves ballots to Google Sheets
+# - Saves ballots to Google Sheets from a background worker (the page doesn't
+#   wait on the write; a small polling fragment reports the outcome as soon as
+#   it's done). Ballots that queue up while a write is in flight go out
+#   together in the next one.
 # - Requires an email and lets a voter replace their prior vote
-# - Radio-like checkbox grid (1 / 2 / 3 votes per row, max 1 checked)
+# - Voting grid is a single st.data_editor (1 / 2 / 3 vote checkbox columns;
+#   if a row has several ticks, the highest one counts)
 # - “Propose a different name” appears below the grid
-# - Metrics (Total credits used / Credits remaining) centered and styled
-# - Optimized: cached Google Sheets client & cached email set; duplicate
-#   check only when the email actually changes
+# - Metrics (Total credits used / Credits remaining) centered, styled and
+#   sticky at the top while scrolling
+# - Optimized: cached Google Sheets client, header row ensured once per
+#   process, cached email index (both prefetched in the background on page
+#   load); duplicate check only when the email actually changes; replacing
+#   a vote deletes the old rows in a single batched request; the grid +
+#   metrics run as an st.fragment so a checkbox click reruns only that block
 # ------------------------------------------------------------
 
 import re
+import threading
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import gspread
+import numpy as np
+import pandas as pd
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timezone
+from google.oauth2.service_account import Credentials
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ===================== Google Sheets helpers (CACHED) =====================
 
-@st.cache_resource
+@st.cache_resource(ttl=3000)  # rebuild every 50 min, inside the 1h token lifetime
 def _get_ws_cached():
     """
     Build and cache the Google Sheets worksheet handle for this session.
 
     Why cache? Streamlit re-runs the script on every UI interaction; caching
-    prevents re-auth + re-open on each rerun, keeping the UI snappy.
+    prevents re-auth + re-open on each rerun, keeping the UI snappy. The TTL
+    additionally rebuilds the client every 50 minutes, inside the ~1 hour
+    OAuth access token lifetime.
     """
-    import gspread
-    from google.oauth2.service_account import Credentials
-
     # Scopes: spreadsheet access + Drive is handy for Shared Drives
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets",
@@ -39,6 +55,9 @@ def _get_ws_cached():
     #   - "worksheet_name"      (optional; defaults to "Responses")
     secrets = st.secrets
     creds = Credentials.from_service_account_info(secrets["gcp_service_account"], scopes=scopes)
+    # authorize() wraps creds in a google-auth AuthorizedSession, which refreshes
+    # the access token by itself before each request once it has expired. The
+    # TTL above and the 401 retry on append are only a backstop for that.
     gc = gspread.authorize(creds)
     sh = gc.open_by_key(secrets["sheet_id"])
     ws_name = secrets.get("worksheet_name", "Responses")
@@ -46,74 +65,230 @@ def _get_ws_cached():
     # Get worksheet; create it if missing
     try:
         ws = sh.worksheet(ws_name)
-    except Exception:  # gspread.exceptions.WorksheetNotFound
+    except gspread.exceptions.WorksheetNotFound:
         ws = sh.add_worksheet(title=ws_name, rows=1000, cols=100)
     return ws
 
 
-@st.cache_data(ttl=120)  # refresh email list at most every 120 seconds
-def _get_email_set():
+@st.cache_resource
+def _ensure_headers() -> list[str]:
     """
-    Return a set of all emails (lowercased) currently stored in the sheet.
-
-    Cached for 120s to avoid hitting the API on every rerun. We *manually*
-    clear this cache after a successful submit so new emails are visible
-    immediately.
+    Return the sheet's header row (row 1), writing FIXED_HEADERS first if the
+    sheet is empty. Runs at most once per process: it's kicked off at page
+    load, so submits go straight to append_rows.
     """
     ws = _get_ws_cached()
     headers = ws.row_values(1)
+    if not headers:
+        ws.append_rows([FIXED_HEADERS], value_input_option="RAW",
+                       insert_data_option="INSERT_ROWS", table_range="A1")
+        headers = list(FIXED_HEADERS)
+    return headers
+
+
+@st.cache_data(ttl=120)  # refresh email index at most every 120 seconds
+def _get_email_index() -> dict[str, list[int]]:
+    """
+    Return {email (lowercased): [sheet row numbers]} for every stored ballot.
+
+    Built from ONE col_values call on the email column only (its position
+    comes from _ensure_headers), not the whole sheet. Cached for 120s to
+    avoid hitting the API on every rerun. We *manually* clear this cache
+    after a successful submit so new emails are visible immediately.
+    """
     try:
-        col_idx = headers.index("email") + 1  # 1-based column index
+        col_idx = _ensure_headers().index("email") + 1  # 1-based column index
     except ValueError:
-        return set()
-    # Skip header row; normalize spacing and case
-    return {e.strip().lower() for e in ws.col_values(col_idx)[1:]}
+        return {}
+    idx: dict[str, list[int]] = {}
+    # Skip header row; normalize spacing and case. Row numbers are 1-based.
+    for row_num, e in enumerate(_get_ws_cached().col_values(col_idx)[1:], start=2):
+        if e.strip():
+            idx.setdefault(e.strip().lower(), []).append(row_num)
+    return idx
 
 
 def email_already_voted(email: str) -> bool:
-    """Fast duplicate check against the cached set."""
+    """Fast duplicate check against the cached index."""
     if not email:
         return False
-    return email.strip().lower() in _get_email_set()
+    return email.strip().lower() in _get_email_index()
 
 
-def delete_votes_for_email(email: str):
+def _prefetch_email_index():
     """
-    Delete any existing rows for this email.
-    OK for small/medium sheets. If you scale up a lot, store an index.
+    Ensure the header row and warm the email index cache from a background
+    thread. Errors are ignored here; the foreground duplicate check will hit
+    and report the same one.
     """
-    if not email:
-        return
-    ws = _get_ws_cached()
-    headers = ws.row_values(1)
     try:
-        col_idx = headers.index("email") + 1
-    except ValueError:
-        return
-    # Only consider matches in the email column
-    cells = [c for c in ws.findall(email) if c.col == col_idx]
-    rows = sorted({c.row for c in cells if c.row != 1}, reverse=True)
-    for r in rows:
-        ws.delete_rows(r)
+        _ensure_headers()
+        _get_email_index()
+    except Exception:
+        pass
 
 
-def save_vote_to_gsheet(row_dict: dict):
+def _start_prefetch():
+    """
+    Run _prefetch_email_index on a background thread. Called once per
+    session: the index cache only lives 120s and every submit clears it, so
+    a once-per-process warm-up would leave most visitors with a cold cache
+    (_ensure_headers itself still only runs once per process). The thread
+    calls st.cache_* helpers on purpose, so it gets this script's context
+    attached; without one Streamlit logs a "missing ScriptRunContext" warning.
+    """
+    thread = threading.Thread(target=_prefetch_email_index, daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+
+
+def _delete_row_requests(sheet_id: int, rows: list[int]) -> list[dict]:
+    """
+    Turn 0-based row indices into `deleteDimension` requests, merging runs of
+    consecutive rows into one range. Ranges are emitted bottom-up so earlier
+    deletions don't shift the indices of later ones.
     """
-    Append a ballot row to the sheet. If there's no header yet, write one
-    using the keys of row_dict (stable column order).
+    reqs = []
+    for r in sorted(set(rows), reverse=True):
+        if reqs and reqs[-1]["deleteDimension"]["range"]["startIndex"] == r + 1:
+            reqs[-1]["deleteDimension"]["range"]["startIndex"] = r
+            continue
+        reqs.append({"deleteDimension": {"range": {
+            "sheetId": sheet_id,
+            "dimension": "ROWS",
+            "startIndex": r,
+            "endIndex": r + 1,
+        }}})
+    return reqs
+
+
+def delete_votes_for_emails(emails):
+    """
+    Delete any existing rows for these emails.
+    Row numbers come from the email index and every match is removed in ONE
+    batch_update, instead of one delete_rows round-trip per matching row.
+    """
+    # Row numbers shift whenever anyone deletes, so never trust a cached index
+    # here: drop it and rebuild from the live sheet before deleting.
+    _get_email_index.clear()
+    idx = _get_email_index()
+    rows = [r for e in emails for r in idx.get(e.strip().lower(), [])]
+    if rows:
+        ws = _get_ws_cached()
+        # deleteDimension wants 0-based indices
+        ws.spreadsheet.batch_update({"requests": _delete_row_requests(ws.id, [r - 1 for r in rows])})
+
+
+@lru_cache(maxsize=4)
+def _header_positions(headers: tuple[str, ...]) -> tuple[int | None, ...]:
+    """
+    For each sheet column, the index of the matching FIXED_HEADERS value in a
+    ballot row (None for columns we don't write). Computed once per layout;
+    a plain lru_cache, as st.cache_data's hashing and pickling would cost more
+    than the lookup it saves.
+    """
+    pos = {h: i for i, h in enumerate(FIXED_HEADERS)}
+    return tuple(pos.get(h) for h in headers)
+
+
+def save_votes_to_gsheet(ballots: list[list]):
+    """
+    Append ballot rows (values in FIXED_HEADERS order) to the sheet in a
+    single append_rows request. A 401 (expired token) re-authorizes and
+    retries once.
     """
     ws = _get_ws_cached()
-    headers = ws.row_values(1)
-    if not headers:
-        ws.append_row(list(row_dict.keys()))
-        headers = ws.row_values(1)
-    ws.append_row([row_dict.get(h, "") for h in headers])
+    headers = _ensure_headers()
+    if headers != FIXED_HEADERS:
+        # Sheet was started with a different column layout (e.g. OPTIONS changed
+        # since): place values by header name instead of by position.
+        positions = _header_positions(tuple(headers))
+        ballots = [[b[i] if i is not None else "" for i in positions] for b in ballots]
+    # RAW: store values as-is, no formula/date parsing. INSERT_ROWS + an A1
+    # table range: always add fresh rows after the table anchored at A1.
+    append_opts = dict(value_input_option="RAW", insert_data_option="INSERT_ROWS", table_range="A1")
+    try:
+        ws.append_rows(ballots, **append_opts)
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code != 401:
+            raise
+        # Token expired before the TTL rebuilt the client: drop it and re-auth
+        _get_ws_cached.clear()
+        _get_ws_cached().append_rows(ballots, **append_opts)
+
+
+@st.cache_resource
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Process-wide worker that performs Sheets writes off the script thread.
+
+    A single worker on purpose: writes run one at a time, in submit order,
+    so one voter's "delete old rows" can't interleave with another's append.
+    The worker calls st.cache_* helpers, so like the prefetch thread it gets
+    the creating script's context attached (from inside, as it starts).
+    """
+    return ThreadPoolExecutor(
+        max_workers=1,
+        thread_name_prefix="sheets-writer",
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    )
+
+
+@st.cache_resource
+def _get_pending() -> deque:
+    """Process-wide queue of (email, row, replace, Future) awaiting a write."""
+    return deque()
+
+
+def _flush_pending():
+    """
+    Write every queued ballot in one go: one batch_update for all rows being
+    replaced, then one append_rows for all new rows. Ballots that pile up while
+    a write is in flight therefore share the next request instead of costing
+    one each. Runs on the writer thread; each ballot's Future gets the outcome.
+    """
+    pending = _get_pending()
+    batch = []
+    while pending:
+        batch.append(pending.popleft())
+    if not batch:
+        return  # an earlier flush already wrote these
+    # Same email twice in one batch (e.g. a double submit): the last row wins,
+    # but any ballot asking to replace still gets the old rows deleted
+    latest = {}
+    for email, row, replace, _ in batch:
+        replace = replace or (email in latest and latest[email][1])
+        latest[email] = (row, replace)
+    try:
+        replaced = [email for email, (_, replace) in latest.items() if replace]
+        if replaced:
+            delete_votes_for_emails(replaced)
+        save_votes_to_gsheet([row for row, _ in latest.values()])
+        _get_email_index.clear()
+    except Exception as e:
+        for *_, fut in batch:
+            fut.set_exception(e)
+    else:
+        for *_, fut in batch:
+            fut.set_result(None)
+
+
+def submit_ballot(email: str, row: list, replace: bool) -> Future:
+    """
+    Queue one ballot for the writer thread and return a Future for its write.
+    If replace is set, the voter's old rows are deleted before appending.
+    """
+    fut = Future()
+    _get_pending().append((email, row, replace, fut))
+    _get_executor().submit(_flush_pending)
+    return fut
 
 
 # ============================ App config & styles ============================
 
 BUDGET = 9
-OPTIONS = [
+OPTIONS = (  # tuple: fixed for the process, shared by the grid and FIXED_HEADERS
     "How Did We Get Here?",
     "How In The World?",
     "I Made This For You",
@@ -126,40 +301,44 @@ OPTIONS = [
     "Rise and Theorize",
     "What In The World?",
     "Your Passions Made Possible By",
-]
+)
+
+# Sheet columns, in order. Ballot rows are built positionally to match.
+FIXED_HEADERS = ["timestamp_utc", "email", "total_cost", *OPTIONS, "Other (text)", "Other (votes)"]
+
+# Simple, robust email validator, compiled once at import rather than per rerun.
+# The pattern has no letters, so no IGNORECASE flag is needed.
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 st.set_page_config(page_title="Podcast Name Voting — Quadratic Voting", page_icon="📊")
 
 # ---------- Metric styling ----------
-# We render our *own* label above each metric and let st.metric show only the number.
+# Each metric is plain HTML (our label above a big number) rather than st.metric,
+# so the whole pair is ONE markdown element per placeholder.
 # The CSS below:
-#   1) Centers metric content
-#   2) Hides Streamlit's internal label & delta space so the number sits right under our label
-#   3) Lets you tune sizes/spacing in ONE place
-st.markdown("""
+#   1) Centers the pair in the middle half of the page
+#   2) Lets you tune sizes/spacing in ONE place
+# It is injected together with the help text below, as a single element.
+APP_CSS = """
 <style>
-/* Center metric contents and remove internal gaps */
-div[data-testid="stMetric"] { text-align: center; }
-div[data-testid="stMetric"] > div {
+/* Two metrics side by side, centered, using the middle half of the page */
+.metric-pair {
   display: flex;
-  flex-direction: column;
-  align-items: center;          /* center children horizontally */
-  gap: 0 !important;            /* remove default spacing inside metric */
-  margin: 0 !important;
-  padding: 0 !important;
+  width: 50%;                   /* ← widen/narrow the middle block here */
+  margin: 0 auto 1rem;
 }
-/* Hide the built-in label and delta blocks so no extra space remains */
-div[data-testid="stMetricLabel"] {
-  display: none !important;
-  height: 0 !important;
-  margin: 0 !important;
-  padding: 0 !important;
+.metric-pair > div { flex: 1; text-align: center; }
+/* Keep the one metric pair in view while scrolling down the grid */
+div[data-testid="stElementContainer"]:has(> [data-testid="stMarkdown"] .metric-pair) {
+  position: sticky;
+  top: 3.75rem;                 /* ← clears Streamlit's top toolbar */
+  z-index: 9;
+  backdrop-filter: blur(8px);   /* ← grid rows scrolling underneath stay out of the way */
 }
-div[data-testid="stMetricDelta"] { display: none !important; }
 
 /* === TWEAKS YOU CAN EDIT ===
    - .metric-label controls the text above each number
-   - stMetricValue controls the number itself
+   - .metric-value controls the number itself
 */
 .metric-label{
   text-align: center;
@@ -170,36 +349,33 @@ div[data-testid="stMetricDelta"] { display: none !important; }
   margin: 0px 0 0px;     /* ← vertical spacing around label */
   color: inherit;        /* ← or set a specific color, e.g., #1f2937 */
 }
-div[data-testid="stMetricValue"]{
+.metric-value{
   font-size: 2.0rem;     /* ← number size */
   font-weight: 600;      /* ← number weight */
   line-height: 1.0;      /* ← tighter vertical spacing */
-  margin: 0 !important;  /* ← remove extra margin */
+  margin: 0.25rem 0 0;   /* ← gap between label and number */
   text-align: center;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-def render_metric_pair(total_cost: int, remaining: int):
+def render_metric_pair(placeholder, total_cost: int, remaining: int):
     """
-    Draw the two metrics centered on the page with custom labels above each number.
-    Edit the column ratios below if you want a wider or narrower center block.
+    Draw the two metrics (custom label above each number) into a st.empty()
+    placeholder as a single HTML element, replacing whatever it showed before.
     """
-    left, center_col, right = st.columns([1, 2, 1])  # ← widen/narrow the middle block here
-    with center_col:
-        c1, c2 = st.columns([1, 1])                  # ← adjust each metric's width here
-        with c1:
-            st.markdown('<div class="metric-label">Total credits used</div>', unsafe_allow_html=True)
-            st.metric(label="", value=total_cost)     # label="" so our custom label is the only one
-        with c2:
-            st.markdown('<div class="metric-label">Credits remaining</div>', unsafe_allow_html=True)
-            st.metric(label="", value=remaining)
+    placeholder.markdown(
+        '<div class="metric-pair">'
+        f'<div><div class="metric-label">Total credits used</div><div class="metric-value">{total_cost}</div></div>'
+        f'<div><div class="metric-label">Credits remaining</div><div class="metric-value">{remaining}</div></div>'
+        '</div>',
+        unsafe_allow_html=True,
+    )
 
 
 # ============================== Header & help ==============================
 
-st.title("Podcast Name Voting — Quadratic Voting")
-st.markdown("""
+HELP_MD = """
 ### In a quadratic voting system, each participant gets credits they can spend on votes.
 ### **The stronger your support, the more credits it costs.**
 
@@ -216,13 +392,20 @@ Here, each participant gets **9 credits**:
 2. Spend **up to 9 credits** total — the counter shows what you’ve used and what’s left.  
 3. You **can** submit with unused credits, but spending all 9 is encouraged.  
 4. Don’t see a name you like? Use **Propose a different name** below, then vote on it.
-""")
+"""
+
+st.title("Podcast Name Voting — Quadratic Voting")
+# Static page styling + instructions go out as ONE markdown element per run
+st.markdown(APP_CSS + HELP_MD, unsafe_allow_html=True)
 
 
 # ============================== Email (first) ==============================
 
-# Simple, robust email validator (case-insensitive)
-EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", re.IGNORECASE)
+# Fetch the email index in the background once per session, while the voter
+# is still typing, so the first duplicate check finds it already cached.
+if not st.session_state.get("_prefetched"):
+    st.session_state["_prefetched"] = True
+    _start_prefetch()
 
 st.subheader("Who’s voting?")
 raw_email = st.text_input("Email address (required to submit)", key="voter_email").strip()
@@ -244,120 +427,177 @@ if valid_email and already:
 if raw_email and not valid_email:
     st.error("Please enter a valid email address (e.g., name@example.com).")
 
-# Reserve a visual spot for the TOP metrics; we'll fill it after computing totals.
-top_metrics_placeholder = st.container()
 
+# =============== Voting grid (one st.data_editor of checkboxes) ===============
+
+# One row per option plus a final row for the voter's own proposal. The frame
+# always has the same shape (even with no proposal yet) so the keyed editor
+# keeps its edits across reruns; only the last row's label changes.
+VOTE_COLS = ["1", "2", "3"]
+# A row's ticks packed as bits (1 vote = 1, 2 votes = 2, 3 votes = 4) index
+# this table to give its vote count; several ticks → the highest one counts.
+# int64, not int8: np.dot accumulates in the input dtype, and an int8 sum of
+# squares would overflow past 14 rows of 3 votes.
+VOTE_LUT = np.array([0, 1, 2, 2, 3, 3, 3, 3], dtype=np.int64)
+OTHER_PLACEHOLDER = "Other (type a name below)"
+GRID_CONFIG = {
+    "Name": st.column_config.TextColumn("Name options"),
+    "1": st.column_config.CheckboxColumn("1 vote", width="small"),
+    "2": st.column_config.CheckboxColumn("2 votes", width="small"),
+    "3": st.column_config.CheckboxColumn("3 votes", width="small"),
+}
 
-# ================= Voting grid (radio-like checkboxes per row) ================
 
-def exclusify(active_key: str, row_keys: list[str]):
+@st.fragment
+def voting_fragment():
     """
-    Make the three checkboxes per row behave like radio buttons:
-    when one is checked, uncheck the others in that row.
+    Metrics, voting grid, "propose a name" input and budget guidance.
+
+    Runs as a fragment: a checkbox click or a new proposal reruns only this
+    block, not the email check and header above it. The ballot is stashed in
+    st.session_state so the Submit handler (outside) can read it.
     """
-    if st.session_state.get(active_key, False):
-        for k in row_keys:
-            if k != active_key:
-                st.session_state[k] = False
-
-# Read proposed name (the input lives below the table; we read it now so
-# the new row appears above as soon as text is present)
-proposed_name = (st.session_state.get("proposed_name") or "").strip()
-include_other = bool(proposed_name)
-
-# Header row for the grid
-h0, h1, h2, h3 = st.columns([3, 1, 1, 1])
-h0.markdown("**Name options**")
-h1.markdown("**1 vote**")
-h2.markdown("**2 votes**")
-h3.markdown("**3 votes**")
-
-votes_dict = {}
-rows = OPTIONS + ([proposed_name] if include_other else [])
-other_vote = 0
-
-for i, label in enumerate(rows):
-    c0, c1, c2, c3 = st.columns([3, 1, 1, 1])
-    c0.write(label if label else "Other")
-
-    # Stable keys per row so Streamlit remembers selections across reruns
-    k1 = f"row{i}_v1"
-    k2 = f"row{i}_v2"
-    k3 = f"row{i}_v3"
-    row_keys = [k1, k2, k3]
-
-    # Disable the 'Other' row until text is entered; also clear any stale checks
-    disabled = (i == len(OPTIONS) and not include_other)
-    if disabled:
-        for k in row_keys:
-            st.session_state[k] = False
-
-    # Three checkboxes with instant exclusivity within the row
-    c1.checkbox("", key=k1, on_change=exclusify, args=(k1, row_keys), disabled=disabled)
-    c2.checkbox("", key=k2, on_change=exclusify, args=(k2, row_keys), disabled=disabled)
-    c3.checkbox("", key=k3, on_change=exclusify, args=(k3, row_keys), disabled=disabled)
-
-    # Convert checkbox state → vote count (0/1/2/3)
-    v = 3 if st.session_state.get(k3) else 2 if st.session_state.get(k2) else 1 if st.session_state.get(k1) else 0
-
-    if i < len(OPTIONS):
-        votes_dict[label] = v
+    # Reserve a visual spot for the TOP metrics; we'll fill it after computing totals.
+    top_metrics_placeholder = st.empty()
+
+    # Read proposed name (the input lives below the table; we read it now so
+    # it shows up in the grid's last row as soon as text is present)
+    proposed_name = (st.session_state.get("proposed_name") or "").strip()
+    include_other = bool(proposed_name)
+
+    # The whole grid is ONE widget; edits come back as a single frame. Names
+    # go out as a categorical (int codes + one copy of each label) rather
+    # than an object column; the index stays a plain RangeIndex, since the
+    # editor would drop its edits whenever index values (the proposal) change.
+    names = [*OPTIONS, proposed_name or OTHER_PLACEHOLDER]
+    grid = pd.DataFrame({
+        # dict.fromkeys: a proposal matching an option mustn't duplicate a category
+        "Name": pd.Categorical(names, categories=list(dict.fromkeys(names)), ordered=True),
+        "1": False,
+        "2": False,
+        "3": False,
+    })
+    edited = st.data_editor(
+        grid,
+        column_config=GRID_CONFIG,
+        disabled=["Name"],
+        hide_index=True,
+        num_rows="fixed",
+        key="grid",
+    )
+
+    # There are no per-cell callbacks, so "one box per row" is enforced here:
+    # pack each row's ticks into bits and decode them all with one table lookup
+    # (branch-free; the rightmost, i.e. highest, tick in a row wins).
+    bits = edited[VOTE_COLS].to_numpy() @ np.array([1, 2, 4])
+    multi = (bits & (bits - 1)) != 0  # more than one bit set
+    votes_arr = VOTE_LUT[bits]  # vote count 0..3 per row (a fresh, writable array)
+    # The proposal row only counts once there's a name to vote for; ticks on
+    # the placeholder row are kept (they count once a name is typed) but flagged
+    stray_other = not include_other and bits[-1] != 0
+    if not include_other:
+        votes_arr[-1] = 0
+        multi[-1] = False
+    votes_list = votes_arr[:len(OPTIONS)].tolist()
+    other_vote = int(votes_arr[-1])
+
+    # -------- Compute totals and render TOP metrics in the placeholder --------
+    # Quadratic cost of every row (proposal included): sum of squares = v · v
+    total_cost = int(np.dot(votes_arr, votes_arr))
+    remaining = BUDGET - total_cost
+
+    render_metric_pair(top_metrics_placeholder, total_cost, remaining)
+
+    # ============== Propose a different name (below the grid) ==============
+
+    st.subheader("Propose a different name (optional)")
+    st.text_input(
+        "Don't see a name you'd like to add? Put it here:",
+        key="proposed_name",
+        help="Type a name and it will appear in the last row of the table above. Then you can vote on it.",
+    )
+
+    # Helpful guidance, composed into ONE alert: an error if over budget
+    # (with any notes folded in), otherwise a single warning
+    notes = []
+    if multi.any():
+        notes.append(
+            "More than one box is ticked for: "
+            + ", ".join(edited.loc[multi, "Name"])
+            + ". Only the highest one counts."
+        )
+    if stray_other:
+        notes.append(
+            "The “Other” row is ticked but has no name yet, so it doesn't count. "
+            "Type a name below to vote for it, or untick it."
+        )
+    if total_cost > BUDGET:
+        st.error("\n\n".join(["Over budget — uncheck something until you’re at 9 credits or less.", *notes]))
     else:
-        other_vote = v  # votes for the "Other" row
+        if remaining > 0:
+            notes.append(
+                f"You have {remaining} credit{'s' if remaining != 1 else ''} left. "
+                "While you don't have to spend all your credits, it is encouraged."
+            )
+        if notes:
+            st.warning("\n\n".join(notes))
 
-# -------- Compute totals and render TOP metrics in the placeholder --------
-total_cost = sum(v * v for v in votes_dict.values()) + other_vote * other_vote
-remaining = BUDGET - total_cost
+    # Hand the ballot to the Submit handler, which lives outside the fragment
+    st.session_state["totals"] = (total_cost, remaining)
+    st.session_state["ballot"] = (votes_list, proposed_name, other_vote)
 
-with top_metrics_placeholder:
-    render_metric_pair(total_cost, remaining)
 
+voting_fragment()
 
-# ================= Propose a different name (below the grid) =================
 
-st.subheader("Propose a different name (optional)")
-st.text_input(
-    "Don't see a name you'd like to add? Put it here:",
-    key="proposed_name",
-    help="Type a name and it will appear as a new row above. Then you can vote on it.",
-)
+# ========================= Submit gating & save =========================
 
-# Duplicate the metrics at the bottom, centered
-render_metric_pair(total_cost, remaining)
+@st.fragment(run_every=2)
+def await_submit_fragment():
+    """
+    Poll the pending background save and trigger a full rerun once it's done,
+    so the report below shows up without the voter touching anything (grid
+    edits alone only rerun voting_fragment). Only rendered while a save is
+    pending, so the polling stops with that rerun.
+    """
+    last_submit = st.session_state.get("_last_submit_future")
+    if last_submit is not None and last_submit.done():
+        st.rerun()
+
+
+# Report how the previous background save went (a submit returns before the
+# write to Google Sheets has finished)
+last_submit = st.session_state.get("_last_submit_future")
+if last_submit is not None and last_submit.done():
+    del st.session_state["_last_submit_future"]
+    if last_submit.exception() is not None:
+        st.error(f"Sorry, saving your last vote failed ({last_submit.exception()}). Please submit again.")
+    else:
+        st.success("Thanks! Your vote has been recorded in Google Sheets.")
+        st.balloons()
 
-# Helpful guidance about budget usage
-if total_cost > BUDGET:
-    st.error("Over budget — uncheck something until you’re at 9 credits or less.")
-elif remaining > 0:
-    st.warning(
-        f"You have {remaining} credit{'s' if remaining != 1 else ''} left. "
-        "While you don't have to spend all your credits, it is encouraged."
-    )
+# Disable submit if: invalid email, or duplicate without replace. The budget
+# can change inside the fragment without rerunning this part, so it is
+# checked when the button is clicked instead.
+disable_submit = (not valid_email) or (already and not allow_replace)
 
+if st.button("Submit", disabled=disable_submit, type="primary"):
+    total_cost, _ = st.session_state["totals"]
+    votes_list, other_text, other_vote = st.session_state["ballot"]
 
-# ========================= Submit gating & save =========================
+    if total_cost > BUDGET:
+        st.error("Over budget — uncheck something until you’re at 9 credits or less.")
+        st.stop()
 
-# Disable submit if: over budget, invalid email, or duplicate without replace
-disable_submit = (total_cost > BUDGET) or (not valid_email) or (already and not allow_replace)
+    # A single row representing the full ballot (FIXED_HEADERS order)
+    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    row = [ts, email, total_cost, *votes_list, other_text, other_vote]
 
-if st.button("Submit", disabled=disable_submit, type="primary"):
-    # If replacing prior ballot, remove old rows for this email first
-    if already and allow_replace:
-        delete_votes_for_email(email)
-
-    # Append a single row representing the full ballot
-    row_out = {
-        "timestamp_utc": datetime.utcnow().isoformat(),
-        "email": email,
-        "total_cost": total_cost,
-        **votes_dict,
-        "Other (text)": proposed_name if include_other else "",
-        "Other (votes)": other_vote,
-    }
-    save_vote_to_gsheet(row_out)
-
-    # Clear the cached email set so duplicate checks reflect this submission immediately
-    _get_email_set.clear()
-
-    st.success("Thanks! Your vote was recorded in Google Sheets.")
-    st.balloons()
\ No newline at end of file
+    # Hand the Sheets write to the background worker so the page responds
+    # right away; await_submit_fragment reruns the page once it's done.
+    st.session_state["_last_submit_future"] = submit_ballot(email, row, already and allow_replace)
+
+    st.info("Thanks! Your vote is being recorded in Google Sheets.")
+
+if "_last_submit_future" in st.session_state:
+    await_submit_fragment()